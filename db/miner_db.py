@@ -1,12 +1,19 @@
-from sqlalchemy import create_engine, Column, Date, Boolean, MetaData, Table, String, Integer, Float, inspect, func, desc, asc, desc, and_
+from sqlalchemy import create_engine, Column, Date, Boolean, MetaData, Table, String, Integer, Float, inspect, func, desc, asc, desc, and_, insert, update, tuple_, Index, select, union_all, literal, cast, null, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import sessionmaker, aliased
-from typing import Union, List, Dict
+from typing import Union, List, Dict, Iterator
+from cachetools import TTLCache, cached
 from utils.config import get_postgres_miner_url
 from utils.utils import has_stablecoin
 from utils.helpers import get_seconds_from_period
+from utils.log import logger
 
 from datetime import datetime
+import csv
+import io
+import threading
 
 # Define the base class for your table models
 Base = declarative_base()
@@ -23,6 +30,10 @@ class Timetable(BaseTable):
     end = Column(Date)
     completed = Column(Boolean)
 
+    __table_args__ = (
+        Index('ix_timetable_completed_start', 'completed', 'start'),
+    )
+
 class TokenPairTable(BaseTable):
     __tablename__ = 'token_pairs'
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -36,12 +47,17 @@ class TokenPairTable(BaseTable):
     completed = Column(Boolean, nullable=False)
     last_synced_time = Column(Integer, nullable=True)
 
+    __table_args__ = (
+        # A Uniswap V3 pool is identified by its tokens and fee tier
+        Index('uq_token_pairs_token0_token1_fee', 'token0', 'token1', 'fee', unique=True),
+    )
+
 class SwapEventTable(BaseTable):
     __tablename__ = 'swap_event'
     id = Column(Integer, primary_key=True, autoincrement=True)
     transaction_hash = Column(String, nullable=False)
     pool_address = Column(String, nullable=False)
-    block_number = Column(Integer, nullable=False)
+    block_number = Column(Integer, nullable=False, index=True)
     timestamp = Column(Integer, nullable=False)
     sender = Column(String, nullable=False)
     to = Column(String, nullable=False)
@@ -51,12 +67,17 @@ class SwapEventTable(BaseTable):
     liquidity = Column(String, nullable=False)  # U256 can be stored as String
     tick = Column(Integer, nullable=False)  # i32 can be stored as Integer
 
+    __table_args__ = (
+        Index('ix_swap_event_pool_address_block_number', 'pool_address', 'block_number'),
+        Index('ix_swap_event_pool_address_timestamp', 'pool_address', 'timestamp'),
+    )
+
 class MintEventTable(BaseTable):
     __tablename__ = 'mint_event'
     id = Column(Integer, primary_key=True, autoincrement=True)
     transaction_hash = Column(String, nullable=False)
     pool_address = Column(String, nullable=False)
-    block_number = Column(Integer, nullable=False)
+    block_number = Column(Integer, nullable=False, index=True)
     timestamp = Column(Integer, nullable=False)
     sender = Column(String, nullable=False)
     owner = Column(String, nullable=False)
@@ -66,12 +87,17 @@ class MintEventTable(BaseTable):
     amount0 = Column(String, nullable=False)  # U256 can be stored as String
     amount1 = Column(String, nullable=False)  # U256 can be stored as String
 
+    __table_args__ = (
+        Index('ix_mint_event_pool_address_block_number', 'pool_address', 'block_number'),
+        Index('ix_mint_event_pool_address_timestamp', 'pool_address', 'timestamp'),
+    )
+
 class BurnEventTable(BaseTable):
     __tablename__ = 'burn_event'
     id = Column(Integer, primary_key=True, autoincrement=True)
     transaction_hash = Column(String, nullable=False)
     pool_address = Column(String, nullable=False)
-    block_number = Column(Integer, nullable=False)
+    block_number = Column(Integer, nullable=False, index=True)
     timestamp = Column(Integer, nullable=False)
     owner = Column(String, nullable=False)
     tick_lower = Column(Integer, nullable=False)  # int24 can be stored as Integer
@@ -80,12 +106,17 @@ class BurnEventTable(BaseTable):
     amount0 = Column(String, nullable=False)  # U256 can be stored as String
     amount1 = Column(String, nullable=False)  # U256 can be stored as String
 
+    __table_args__ = (
+        Index('ix_burn_event_pool_address_block_number', 'pool_address', 'block_number'),
+        Index('ix_burn_event_pool_address_timestamp', 'pool_address', 'timestamp'),
+    )
+
 class CollectEventTable(BaseTable):
     __tablename__ = 'collect_event'
     id = Column(Integer, primary_key=True, autoincrement=True)
     transaction_hash = Column(String, nullable=False)
     pool_address = Column(String, nullable=False)
-    block_number = Column(Integer, nullable=False)
+    block_number = Column(Integer, nullable=False, index=True)
     timestamp = Column(Integer, nullable=False)
     owner = Column(String, nullable=False)
     recipient = Column(String, nullable=False)
@@ -94,6 +125,11 @@ class CollectEventTable(BaseTable):
     amount0 = Column(String, nullable=False)  # U256 can be stored as String
     amount1 = Column(String, nullable=False)  # U256 can be stored as String
 
+    __table_args__ = (
+        Index('ix_collect_event_pool_address_block_number', 'pool_address', 'block_number'),
+        Index('ix_collect_event_pool_address_timestamp', 'pool_address', 'timestamp'),
+    )
+
 class PoolMetricTable(BaseTable):
     __tablename__ = 'pool_metrics'
     timestamp = Column(Integer, nullable=False, primary_key=True)
@@ -138,15 +174,147 @@ class TokenMetricTable(Base):
     total_volume = Column(Float)
     total_liquidity = Column(Float)
 
+# It is created by `migrate`, or by the miner's periodic refresh once its source tables exist, so it lives outside of Base.metadata.
+# It is created by `migrate` and refreshed periodically by the miner, so it lives outside of Base.metadata.
+CurrentPoolMetricView = Table(
+    'current_pool_metrics_mv',
+    MetaData(),
+    Column('pool_address', String, primary_key=True),
+    Column('timestamp', Integer),
+    Column('price', Float),
+    Column('liquidity_token0', Float),
+    Column('liquidity_token1', Float),
+    Column('volume_token0', Float),
+    Column('volume_token1', Float),
+    Column('volume_token0_1day', Float),
+    Column('volume_token1_1day', Float),
+    Column('token0_symbol', String),
+    Column('token1_symbol', String),
+    Column('fee', Integer),
+    Column('token0_price', Float),
+    Column('token1_price', Float),
+)
+
+CREATE_CURRENT_POOL_METRIC_VIEW = """
+CREATE MATERIALIZED VIEW IF NOT EXISTS current_pool_metrics_mv AS
+SELECT
+    latest.pool_address,
+    latest.timestamp,
+    latest.price,
+    latest.liquidity_token0,
+    latest.liquidity_token1,
+    latest.volume_token0,
+    latest.volume_token1,
+    latest.volume_token0 - COALESCE(previous.volume_token0, 0) AS volume_token0_1day,
+    latest.volume_token1 - COALESCE(previous.volume_token1, 0) AS volume_token1_1day,
+    token0.symbol AS token0_symbol,
+    token1.symbol AS token1_symbol,
+    token_pair.fee,
+    token_metric0.price AS token0_price,
+    token_metric1.price AS token1_price
+FROM (
+    SELECT DISTINCT ON (pool_address) *
+    FROM pool_metrics
+    ORDER BY pool_address, timestamp DESC
+) AS latest
+LEFT JOIN pool_metrics AS previous
+    ON previous.pool_address = latest.pool_address AND previous.timestamp = latest.timestamp - 300
+JOIN (
+    SELECT DISTINCT ON (pool) pool, token0, token1, fee
+    FROM token_pairs
+    ORDER BY pool, id
+) AS token_pair ON token_pair.pool = latest.pool_address
+JOIN tokens AS token0 ON token0.address = token_pair.token0
+JOIN tokens AS token1 ON token1.address = token_pair.token1
+JOIN current_token_metrics AS token_metric0 ON token_metric0.token_address = token_pair.token0
+JOIN current_token_metrics AS token_metric1 ON token_metric1.token_address = token_pair.token1
+"""
+
+CURRENT_POOL_METRIC_VIEW_INDEXES = [
+    # REFRESH ... CONCURRENTLY requires a unique index on the view
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_current_pool_metrics_mv_pool_address ON current_pool_metrics_mv (pool_address)",
+    "CREATE INDEX IF NOT EXISTS ix_current_pool_metrics_mv_liquidity_token0 ON current_pool_metrics_mv (liquidity_token0)",
+    "CREATE INDEX IF NOT EXISTS ix_current_pool_metrics_mv_volume_token0 ON current_pool_metrics_mv (volume_token0)",
+]
+
+# Bulk inserts of at least this many rows are streamed with COPY instead of a batched INSERT
+COPY_ROW_THRESHOLD = 1000
+
+# Event tables served by fetch_pool_events, keyed by their event type
+POOL_EVENT_TABLES = {
+    'swap': SwapEventTable,
+    'mint': MintEventTable,
+    'burn': BurnEventTable,
+    'collect': CollectEventTable,
+}
+
 class MinerDBManager:
 
     def __init__(self, url = get_postgres_miner_url()) -> None:
         # Create the SQLAlchemy engine
-        self.engine = create_engine(url)
+        # psycopg2 batches executemany() calls into multi-row VALUES pages.
+        # Every endpoint opens its own session, so keep enough pooled connections for concurrent requests.
+        self.engine = create_engine(
+            url,
+            executemany_mode="values_plus_batch",
+            insertmanyvalues_page_size=10000,
+            pool_size=20,
+            max_overflow=40,
+            pool_pre_ping=True,
+            pool_recycle=3600,
+        )
 
         # Create a configured "Session" class
         self.Session = sessionmaker(bind=self.engine)
 
+    def migrate(self) -> None:
+        """Bring an existing database up to date with the models. Run once with `python3 -m src.miner.migrate`."""
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        with self.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            self.deduplicate_token_pairs(connection)
+            self.create_indexes(connection)
+            self.create_current_pool_metric_view(connection)
+
+    def deduplicate_token_pairs(self, connection) -> None:
+        """Keep only the first token pair row of each (token0, token1, fee), so its unique index can be built."""
+        if not inspect(connection).has_table(TokenPairTable.__tablename__):
+            return
+        result = connection.execute(text(
+            "DELETE FROM token_pairs AS duplicate USING token_pairs AS original "
+            "WHERE duplicate.token0 = original.token0 AND duplicate.token1 = original.token1 "
+            "AND duplicate.fee = original.fee AND duplicate.id > original.id"
+        ))
+        if result.rowcount:
+            logger.info('Removed %d duplicate token pairs', result.rowcount)
+        # Superseded by uq_token_pairs_token0_token1_fee
+        connection.execute(text('DROP INDEX CONCURRENTLY IF EXISTS ix_token_pairs_token0_token1_fee'))
+
+    def create_indexes(self, connection) -> None:
+        """Create the indexes declared on the models that are missing from the existing tables, without blocking writes."""
+        inspector = inspect(connection)
+        index_names = {index.name for table in Base.metadata.sorted_tables for index in table.indexes}
+        # An interrupted concurrent build leaves an INVALID index behind that IF NOT EXISTS would keep skipping
+        invalid_indexes = set(connection.scalars(
+            text("SELECT indexrelid::regclass::text FROM pg_index WHERE NOT indisvalid")
+        ).all()) & index_names
+        for index_name in invalid_indexes:
+            connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {index_name}'))
+        
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)} - invalid_indexes
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                columns = ', '.join(column.name for column in index.columns)
+                unique = 'UNIQUE ' if index.unique else ''
+                logger.info('Creating index %s on %s', index.name, table.name)
+                try:
+                    connection.execute(text(f'CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index.name} ON {table.name} ({columns})'))
+                except DBAPIError:
+                    logger.exception('Failed to create index %s on %s', index.name, table.name)
+
     def __enter__(self):
         self.session = self.Session()
         return self
@@ -165,25 +333,31 @@ class MinerDBManager:
     def fetch_timetable_data(self) -> List[Dict[str, Union[Date, bool]]]:
         """Fetch all timetable data from the database."""
         with self.Session() as session:
-            timetable_data = session.query(Timetable).all()
-            return [{"start": row.start, "end": row.end, "completed": row.completed} for row in timetable_data]
+            timetable_data = session.execute(select(Timetable.start, Timetable.end, Timetable.completed)).mappings()
+            return [dict(row) for row in timetable_data]
 
     def fetch_incompleted_time_range(self) -> List[Dict[str, Union[Date, bool]]]:
         """Fetch all not completed time ranges from the timetable."""
         with self.Session() as session:
-            not_completed_data = session.query(Timetable).filter_by(completed=False).all()
-            return [{"start": row.start, "end": row.end, "completed": row.completed} for row in not_completed_data]
+            not_completed_data = session.execute(
+                select(Timetable.start, Timetable.end, Timetable.completed).where(Timetable.completed == False)
+            ).mappings()
+            return [dict(row) for row in not_completed_data]
 
-    def fetch_completed_time(self) -> List[Dict[str, Union[Date, bool]]]:
-        """Fetch all not completed time ranges from the timetable."""
+    # cachetools caches aren't thread-safe and the endpoints run on worker threads
+    @cached(TTLCache(maxsize=2, ttl=60), lock=threading.Lock())
+    def fetch_completed_time(self) -> Dict[str, Union[Date, bool]]:
+        """Fetch the last completed time range from the timetable."""
         with self.Session() as session:
-            row = session.query(Timetable).filter_by(completed=True).order_by(desc(Timetable.start)).first()
+            row = session.scalars(
+                select(Timetable).where(Timetable.completed == True).order_by(Timetable.start.desc()).limit(1)
+            ).first()
             return {"start": row.start, "end": row.end, "completed": row.completed}
     
     def fetch_last_time_range(self) -> Dict[str, Union[Date, bool]]:
         """Fetch the last time range from the timetable."""
         with self.Session() as session:
-            last_time_range = session.query(Timetable).order_by(Timetable.start.desc()).first()
+            last_time_range = session.scalars(select(Timetable).order_by(Timetable.start.desc()).limit(1)).first()
             if last_time_range is not None:
                 return {"start": last_time_range.start, "end": last_time_range.end, "completed": last_time_range.completed}
             else:
@@ -196,32 +370,35 @@ class MinerDBManager:
             if record:
                 record.completed = True
                 session.commit()
+                self.fetch_completed_time.cache_clear()
                 return True
             return False
         
     def add_tokens(self, tokens: List[Dict[str, Union[str, Integer]]]) -> None:
         """Add tokens to the corresponding table."""
-        with self.Session() as session:
-            for token in tokens:
-                exists = (
-                    session.query(TokenTable)
-                    .filter_by(address=token["address"])
-                    .first()
-                )
-                if not exists:
-                    new_token = TokenTable(
-                        address=token["address"],
-                        symbol=token["symbol"],
-                        name=token["name"],
-                        decimals=token["decimals"],
-                    )
-                    session.add(new_token)
-            session.commit()
+        new_tokens = {}
+        for token in tokens:
+            new_tokens.setdefault(token["address"], {
+                "address": token["address"],
+                "symbol": token["symbol"],
+                "name": token["name"],
+                "decimals": token["decimals"],
+            })
+        if not new_tokens:
+            return
+        with self.Session() as session, session.begin():
+            existing_addresses = session.scalars(
+                select(TokenTable.address).where(TokenTable.address.in_(new_tokens.keys()))
+            ).all()
+            for address in existing_addresses:
+                new_tokens.pop(address, None)
+            if new_tokens:
+                session.execute(insert(TokenTable), list(new_tokens.values()))
 
     def add_token_pairs(
         self, token_pairs: List[Dict[str, Union[str, Integer]]], timestamp: int
-    ) -> None:
-        """Add token pairs to the corresponding table."""
+    ) -> int:
+        """Add token pairs to the corresponding table, skipping known pools, and return the number of pairs inserted."""
         with self.Session() as session:
             try:
                 last_token_pair = session.query(TokenPairTable).order_by(TokenPairTable.block_number.desc()).first()
@@ -229,19 +406,19 @@ class MinerDBManager:
                 last_pool_address = last_token_pair.pool
             except:
                 last_block_number = 0
-        print(f'Last block number: {last_block_number}')
+        logger.debug('Last block number: %s', last_block_number)
         insert_values = [
-            TokenPairTable(
-                token0=token_pair["token0"]["address"],
-                token1=token_pair["token1"]["address"],
-                has_stablecoin=has_stablecoin(token_pair),
-                indexed=False,
-                fee=token_pair["fee"],
-                pool=token_pair["pool_address"],
-                block_number=token_pair["block_number"],
-                completed=False,
-                last_synced_time=timestamp
-            )
+            {
+                "token0": token_pair["token0"]["address"],
+                "token1": token_pair["token1"]["address"],
+                "has_stablecoin": has_stablecoin(token_pair),
+                "indexed": False,
+                "fee": token_pair["fee"],
+                "pool": token_pair["pool_address"],
+                "block_number": token_pair["block_number"],
+                "completed": False,
+                "last_synced_time": timestamp,
+            }
             for token_pair in token_pairs
             if token_pair['block_number'] > last_block_number
         ]
@@ -253,63 +430,126 @@ class MinerDBManager:
             ]
         )
 
-        with self.Session() as session:
-            session.add_all(insert_values)
-            session.commit()
+        if not insert_values:
+            return 0
+        # ON CONFLICT needs the unique index, which only `migrate` builds on an existing database
+        if not self.has_token_pair_unique_index():
+            logger.warning('token_pairs is missing its unique index, inserting without skipping known pools. Run `python3 -m src.miner.migrate`')
+            with self.Session() as session, session.begin():
+                session.execute(insert(TokenPairTable), insert_values)
+            return len(insert_values)
+        conflict_columns = ['token0', 'token1', 'fee']
+        if len(insert_values) >= COPY_ROW_THRESHOLD:
+            inserted_count = self.copy_rows(TokenPairTable.__table__, insert_values, conflict_columns)
+        else:
+            with self.Session() as session, session.begin():
+                inserted_ids = session.execute(
+                    pg_insert(TokenPairTable).on_conflict_do_nothing(index_elements=conflict_columns).returning(TokenPairTable.id),
+                    insert_values
+                ).scalars().all()
+            inserted_count = len(inserted_ids)
+        return inserted_count
+    
+    def has_token_pair_unique_index(self) -> bool:
+        """Check whether token_pairs has the unique (token0, token1, fee) index that add_token_pairs resolves conflicts on."""
+        return 'uq_token_pairs_token0_token1_fee' in {
+            index['name'] for index in inspect(self.engine).get_indexes(TokenPairTable.__tablename__)
+        }
+    
+    def copy_rows(self, table: Table, rows: List[Dict], conflict_columns: List[str]) -> int:
+        """Stream rows into a table with PostgreSQL COPY FROM STDIN, skipping rows that conflict on the given columns, and return the number of rows inserted."""
+        columns = ', '.join(rows[0].keys())
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(row.values() for row in rows)
+        buffer.seek(0)
+        
+        # COPY has no ON CONFLICT clause, so stage the rows in a temporary table first
+        staging_table = f'{table.name}_staging'
+        connection = self.engine.raw_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f"CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS SELECT {columns} FROM {table.name} WITH NO DATA")
+                cursor.copy_expert(f"COPY {staging_table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+                cursor.execute(
+                    f"INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {staging_table} "
+                    f"ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING"
+                )
+                inserted_count = cursor.rowcount
+            connection.commit()
+        finally:
+            connection.close()
+        return inserted_count
     
     def fetch_related_tokens(self, token: str):
         with self.Session() as session:
-            res = session.query(TokenPairTable).filter_by(token0=token).all()
-            if res is not None:
-                for token_pair in res:
-                    yield token_pair.token1
-                    
-            res = session.query(TokenPairTable).filter_by(token1=token).all()
-            if res is not None:
-                for token_pair in res:
-                    yield token_pair.token0
+            yield from session.scalars(select(TokenPairTable.token1).where(TokenPairTable.token0 == token)).all()
+            yield from session.scalars(select(TokenPairTable.token0).where(TokenPairTable.token1 == token)).all()
     
-    def search_pool_address(self, token0: str, token1: str):
+    def search_pool_addresses(self, token_pairs: List[tuple]) -> Dict[tuple, str]:
+        """Resolve the pool addresses of several token pairs, in either token order, with a single query."""
+        keys = {(token_pair[0], token_pair[1]) for token_pair in token_pairs}
+        keys |= {(token1, token0) for token0, token1 in keys}
+        if not keys:
+            return {}
         with self.Session() as session:
-            res = session.query(TokenPairTable).filter_by(token0=token0, token1=token1).first()
-            if res is not None:
-                return res.pool
-            
-            res = session.query(TokenPairTable).filter_by(token0=token1, token1=token0).first()
-            if res is not None:
-                return res.pool
-        return None
+            rows = session.execute(
+                select(TokenPairTable.token0, TokenPairTable.token1, TokenPairTable.pool)
+                .where(tuple_(TokenPairTable.token0, TokenPairTable.token1).in_(keys))
+                .order_by(TokenPairTable.id)
+            ).all()
+        pools = {}
+        for token0, token1, pool in rows:
+            pools.setdefault((token0, token1), pool)
+        
+        pool_addresses = {}
+        for token0, token1 in token_pairs:
+            pool = pools.get((token0, token1), pools.get((token1, token0)))
+            if pool is not None:
+                pool_addresses[(token0, token1)] = pool
+        return pool_addresses
             
     def lastSyncedTimestamp(self):
         with self.Session() as session:
             res = session.query(TokenPairTable).order_by(TokenPairTable.last_synced_time.desc()).first()
-            print(f'Last synced timestamp: {res.last_synced_time}')
             if res is not None:
+                logger.debug('Last synced timestamp: %s', res.last_synced_time)
                 return res.last_synced_time
 
-    def fetch_token_pairs(self):
-        """Fetch all token pairs from the corresponding table."""
+    def fetch_pool_addresses(self) -> List[str]:
+        """Fetch the pool addresses of all token pairs."""
         with self.Session() as session:
-            token_pairs = session.query(TokenPairTable).all()
-            return [{"token0": row.token0, "token1": row.token1, "fee": row.fee, "completed": row.completed, 'pool_address': row.pool} for row in token_pairs]
+            return session.scalars(select(TokenPairTable.pool)).all()
 
     def fetch_incompleted_token_pairs(self) -> List[Dict[str, Union[str, int, bool]]]:
         """Fetch all incompleted token pairs from the corresponding table."""
         with self.Session() as session:
-            incompleted_token_pairs = session.query(TokenPairTable).filter_by(completed=False).all()
-            return [{"token0": row.token0, "token1": row.token1, "fee": row.fee, "completed": row.completed} for row in incompleted_token_pairs]
+            incompleted_token_pairs = session.execute(
+                select(
+                    TokenPairTable.token0,
+                    TokenPairTable.token1,
+                    TokenPairTable.fee,
+                    TokenPairTable.completed,
+                ).where(TokenPairTable.completed == False)
+            ).mappings()
+            return [dict(row) for row in incompleted_token_pairs]
 
     def mark_token_pairs_as_complete(self, token_pairs: List[tuple]) -> bool:
-        """Mark a token pair as complete."""
-        with self.Session() as session:
-            for token_pair in token_pairs:
-                record = session.query(TokenPairTable).filter_by(token0=token_pair[0], token1=token_pair[1], fee=token_pair[2]).first()
-                if record:
-                    session.query(TokenPairTable).filter_by(token0=token_pair[0], token1=token_pair[1], fee=token_pair[2]).update({TokenPairTable.completed: True})
-                else:
-                    return False
-            session.commit()
+        """Mark token pairs as complete, only if every one of them exists."""
+        keys = {(token_pair[0], token_pair[1], token_pair[2]) for token_pair in token_pairs}
+        if not keys:
             return True
+        with self.Session() as session, session.begin():
+            result = session.execute(
+                update(TokenPairTable)
+                .where(tuple_(TokenPairTable.token0, TokenPairTable.token1, TokenPairTable.fee).in_(keys))
+                .values(completed=True)
+                .returning(TokenPairTable.token0, TokenPairTable.token1, TokenPairTable.fee)
+            )
+            if set(result.tuples()) != keys:
+                session.rollback()
+                return False
+        return True
+
     def reset_token_pairs(self):
         """Reset the token pairs completed state"""
         with self.Session() as session:
@@ -318,7 +558,7 @@ class MinerDBManager:
     
     def find_pool_metric_timetable_pool_address(self, timestamp: int, pool_address: str, interval: int):
         with self.Session() as session:
-            print(f'Finding uniswap metrics table by timetable {timestamp} and pool address {pool_address}')
+            logger.debug('Finding uniswap metrics table by timetable %s and pool address %s', timestamp, pool_address)
             Token0 = aliased(TokenTable)
             Token1 = aliased(TokenTable)
             result = []
@@ -352,42 +592,57 @@ class MinerDBManager:
                 }
         return pool_metric
     
-    def fetch_pool_events(self, start_block: int, end_block: int):
-        swap_events = self.fetch_swap_events(start_block, end_block)
-        mint_events = self.fetch_mint_events(start_block, end_block)
-        burn_events = self.fetch_burn_events(start_block, end_block)
-        collect_events = self.fetch_collect_events(start_block, end_block)
+    def fetch_pool_events(self, start_block: int, end_block: int) -> Iterator[Dict]:
+        """Stream swap, mint, burn and collect events between two blocks from a single UNION ALL query."""
+        # Align the event tables on the union of their columns, padding the missing ones with typed NULLs
+        columns = {}
+        for table in POOL_EVENT_TABLES.values():
+            for column in table.__table__.columns:
+                columns.setdefault(column.name, column.type)
         
-        return swap_events + mint_events + burn_events + collect_events
-        
-    def fetch_swap_events(self, start_block: int, end_block: int):
-        with self.Session() as session:
-            events = session.query(SwapEventTable).filter(
-                SwapEventTable.block_number >= start_block,
-                SwapEventTable.block_number <= end_block
-            ).all()
-        return events
-    def fetch_mint_events(self, start_block: int, end_block: int):
-        with self.Session() as session:
-            events = session.query(MintEventTable).filter(
-                MintEventTable.block_number >= start_block,
-                MintEventTable.block_number <= end_block
-            ).all()
-        return events
-    def fetch_burn_events(self, start_block: int, end_block: int):
-        with self.Session() as session:
-            events = session.query(BurnEventTable).filter(
-                BurnEventTable.block_number >= start_block,
-                BurnEventTable.block_number <= end_block
-            ).all()
-        return events
-    def fetch_collect_events(self, start_block: int, end_block: int):
+        queries = [
+            select(
+                literal(event_type).label('event_type'),
+                *[
+                    table.__table__.c[name] if name in table.__table__.c else cast(null(), column_type).label(name)
+                    for name, column_type in columns.items()
+                ]
+            ).where(
+                table.block_number >= start_block,
+                table.block_number <= end_block
+            )
+            for event_type, table in POOL_EVENT_TABLES.items()
+        ]
         with self.Session() as session:
-            events = session.query(CollectEventTable).filter(
-                CollectEventTable.block_number >= start_block,
-                CollectEventTable.block_number <= end_block
-            ).all()
-        return events
+            # yield_per runs the query on a server-side cursor and buffers 1000 rows at a time
+            rows = session.execute(union_all(*queries), execution_options={'yield_per': 1000}).mappings()
+            for row in rows:
+                table = POOL_EVENT_TABLES[row['event_type']]
+                yield {column.name: row[column.name] for column in table.__table__.columns}
+        
+    def create_current_pool_metric_view(self, connection) -> None:
+        """Create the current pool metrics materialized view and its indexes, once all of its source tables exist."""
+        inspector = inspect(connection)
+        missing_tables = [
+            table_name
+            for table_name in (PoolMetricTable.__tablename__, TokenPairTable.__tablename__, TokenTable.__tablename__, CurrentTokenMetricTable.__tablename__)
+            if not inspector.has_table(table_name)
+        ]
+        if missing_tables:
+            logger.warning('Skipping %s, missing source tables: %s', CurrentPoolMetricView.name, ', '.join(missing_tables))
+            return
+        connection.execute(text(CREATE_CURRENT_POOL_METRIC_VIEW))
+        for create_index in CURRENT_POOL_METRIC_VIEW_INDEXES:
+            connection.execute(text(create_index))
+
+    def refresh_current_pool_metrics(self) -> None:
+        """Refresh the current pool metrics materialized view, creating it first once the indexer has created its source tables."""
+        with self.engine.begin() as connection:
+            if CurrentPoolMetricView.name not in inspect(connection).get_materialized_view_names():
+                # A freshly created view is already populated
+                self.create_current_pool_metric_view(connection)
+                return
+            connection.execute(text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {CurrentPoolMetricView.name}'))
     
     def fetch_current_pool_metrics(
         self,
@@ -400,88 +655,34 @@ class MinerDBManager:
         with self.Session() as session:
             sort_by = sort_by if sort_by in ['liquidity_token0', 'liquidity_token1', 'volume_token0', 'volume_token1', 'timestamp'] else 'liquidity_token0'
             order_method = desc if sort_order == 'desc' else asc
-            Token0 = aliased(TokenTable)
-            Token1 = aliased(TokenTable)
-            TokenPair = aliased(TokenPairTable)
-            TokenMetric0 = aliased(CurrentTokenMetricTable)
-            TokenMetric1 = aliased(CurrentTokenMetricTable)
-            total_pool_count = session.query(CurrentPoolMetricTable).filter(CurrentPoolMetricTable.pool_address.like(f'%{search_query}%')).count()
-            # recent_fetched_timestamp = session.query(PoolMetricTable.timestamp).group_by().order_by(PoolMetricTable.timestamp.desc()).first()
-            latest_timestamps = session.query(
-                PoolMetricTable.pool_address,
-                func.max(PoolMetricTable.timestamp).label('latest_timestamp')
-            ).group_by(PoolMetricTable.pool_address).subquery()
-
-            # recent_fetched_timestamp = session.query(
-            #     latest_timestamps.c.pool_address,
-            #     latest_timestamps.c.latest_timestamp
-            # ).order_by(latest_timestamps.c.latest_timestamp.desc()).all()
-            # print(f'Recent fetched timestamp: {recent_fetched_timestamp}')
-            pool_metrics = (
-                session.query(
-                    PoolMetricTable,
-                    Token0.symbol.label('token0_symbol'),
-                    Token1.symbol.label('token1_symbol'),
-                    TokenPair.fee.label('fee'),
-                    TokenMetric0.price.label('token0_price'),
-                    TokenMetric1.price.label('token1_price')
+            view = CurrentPoolMetricView.c
+            search_filter = view.pool_address.like(f'%{search_query}%')
+            total_pool_count = session.execute(
+                select(func.count()).select_from(CurrentPoolMetricView).where(search_filter)
+            ).scalar_one()
+            pool_metrics = session.execute(
+                select(
+                    view.pool_address,
+                    view.timestamp,
+                    view.price,
+                    view.liquidity_token0,
+                    view.liquidity_token1,
+                    view.volume_token0.label('total_volume_token0'),
+                    view.volume_token1.label('total_volume_token1'),
+                    view.volume_token0_1day,
+                    view.volume_token1_1day,
+                    view.token0_symbol,
+                    view.token1_symbol,
+                    view.token0_price,
+                    view.token1_price,
+                    view.fee,
                 )
-                .filter(PoolMetricTable.pool_address == latest_timestamps.c.pool_address)
-                .filter(PoolMetricTable.timestamp == latest_timestamps.c.latest_timestamp)
-                .join(TokenPair, PoolMetricTable.pool_address == TokenPair.pool)
-                .join(Token0, TokenPair.token0 == Token0.address)
-                .join(Token1, TokenPair.token1 == Token1.address)
-                .join(TokenMetric0, TokenPair.token0 == TokenMetric0.token_address)
-                .join(TokenMetric1, TokenPair.token1 == TokenMetric1.token_address)
-                .order_by(order_method(getattr(PoolMetricTable, sort_by)))
+                .where(search_filter)
+                .order_by(order_method(view[sort_by]))
                 .limit(page_limit)
                 .offset(page_limit * (page_number - 1))
-                .all()
-            )
-            
-            pool_metrics_with_diff = []
-            for metric in pool_metrics:
-                previous_metric = session.query(PoolMetricTable).filter(
-                    PoolMetricTable.pool_address == metric.PoolMetricTable.pool_address,
-                    PoolMetricTable.timestamp == metric.PoolMetricTable.timestamp - 300
-                ).first()
-                
-                if previous_metric:
-                    metric_diff = {
-                        "pool_address": metric.PoolMetricTable.pool_address,
-                        "timestamp": metric.PoolMetricTable.timestamp,
-                        "price": metric.PoolMetricTable.price,
-                        "liquidity_token0": metric.PoolMetricTable.liquidity_token0,
-                        "liquidity_token1": metric.PoolMetricTable.liquidity_token1,
-                        "total_volume_token0": metric.PoolMetricTable.volume_token0,
-                        "total_volume_token1": metric.PoolMetricTable.volume_token1,
-                        "volume_token0_1day": metric.PoolMetricTable.volume_token0 - previous_metric.volume_token0,
-                        "volume_token1_1day": metric.PoolMetricTable.volume_token1 - previous_metric.volume_token1,
-                        "token0_symbol": metric.token0_symbol,
-                        "token1_symbol": metric.token1_symbol,
-                        "token0_price": metric.token0_price,
-                        "token1_price": metric.token1_price,
-                        "fee": metric.fee
-                    }
-                else:
-                    metric_diff = {
-                        "pool_address": metric.PoolMetricTable.pool_address,
-                        "timestamp": metric.PoolMetricTable.timestamp,
-                        "price": metric.PoolMetricTable.price,
-                        "liquidity_token0": metric.PoolMetricTable.liquidity_token0,
-                        "liquidity_token1": metric.PoolMetricTable.liquidity_token1,
-                        "total_volume_token0": metric.PoolMetricTable.volume_token0,
-                        "total_volume_token1": metric.PoolMetricTable.volume_token1,
-                        "volume_token0_1day": metric.PoolMetricTable.volume_token0,
-                        "volume_token1_1day": metric.PoolMetricTable.volume_token1,
-                        "token0_symbol": metric.token0_symbol,
-                        "token1_symbol": metric.token1_symbol,
-                        "token0_price": metric.token0_price,
-                        "token1_price": metric.token1_price,
-                        "fee": metric.fee
-                    }
-                pool_metrics_with_diff.append(metric_diff)
-            return {"pool_metrics": pool_metrics_with_diff, "total_pool_count": total_pool_count}
+            ).mappings().all()
+            return {"pool_metrics": [dict(metric) for metric in pool_metrics], "total_pool_count": total_pool_count}
     
     def fetch_recent_pool_events(self, page_limit: int, filter_by: str) -> Dict[str, List[Dict[str, Union[str, int]]]]:
         with self.Session() as session:
@@ -576,11 +777,13 @@ class MinerDBManager:
     
     def fetch_pool_metric_api(self, page_limit:int, page_number: int, pool_address: str, interval: str, period: str, start_timestamp: int, end_timestamp: int) -> Dict[str, List[Dict[str, Union[str, int, float]]]]:
         with self.Session() as session:
-            latest_timestamp = session.query(func.max(PoolMetricTable.timestamp)).filter(PoolMetricTable.pool_address == pool_address).first()[0]
-            oldest_timestamp = session.query(func.min(PoolMetricTable.timestamp)).filter(PoolMetricTable.pool_address == pool_address).first()[0]
+            latest_timestamp, oldest_timestamp = session.query(
+                func.max(PoolMetricTable.timestamp),
+                func.min(PoolMetricTable.timestamp),
+            ).filter(PoolMetricTable.pool_address == pool_address).first()
             start_timestamp = start_timestamp if start_timestamp != 0 else max(latest_timestamp - get_seconds_from_period(period), oldest_timestamp)
             end_timestamp = end_timestamp if end_timestamp != 0 else latest_timestamp
-            print(f'Start timestamp: {start_timestamp}, End timestamp: {end_timestamp}')
+            logger.debug('Start timestamp: %s, End timestamp: %s', start_timestamp, end_timestamp)
             total_pool_count = session.query(PoolMetricTable).filter(PoolMetricTable.pool_address == pool_address).count()
             interval = get_seconds_from_period(interval)
             Token0 = aliased(TokenTable)
@@ -627,13 +830,15 @@ class MinerDBManager:
                 .offset(page_limit * (page_number - 1))
                 .all()
             )
-            print(f'Pool metrics: {pool_metrics}')
+            logger.debug('Pool metrics: %r', pool_metrics)
             return {"pool_metrics": pool_metrics, "token_pair_info": token_pair_info, "total_pool_count": total_pool_count}
         
     def fetch_token_metric_api(self, page_limit: int, page_number: int, token_address: str, interval: str, period: str, start_timestamp: int, end_timestamp: int) -> Dict[str, List[Dict[str, Union[str, int, float]]]]:
         with self.Session() as session:
-            latest_timestamp = session.query(func.max(TokenMetricTable.timestamp)).filter(TokenMetricTable.token_address == token_address).first()[0]
-            oldest_timestamp = session.query(func.min(TokenMetricTable.timestamp)).filter(TokenMetricTable.token_address == token_address).first()[0]
+            latest_timestamp, oldest_timestamp = session.query(
+                func.max(TokenMetricTable.timestamp),
+                func.min(TokenMetricTable.timestamp),
+            ).filter(TokenMetricTable.token_address == token_address).first()
             if latest_timestamp is None:
                 return {"token_metrics": [], "token_data": {}, "total_token_count:": 0}
             start_timestamp = start_timestamp if start_timestamp != 0 else max(latest_timestamp - get_seconds_from_period(period), oldest_timestamp)
@@ -779,7 +984,7 @@ class MinerDBManager:
             return {"burn_events": burn_events, "total_burn_count": total_burn_count}
         
     def get_token_info(self, token_address: str) -> Dict[str, Union[str]]:
-        print(f'Fetching token info for {token_address}')
+        logger.debug('Fetching token info for %s', token_address)
         with self.Session() as session:
             token_info = session.query(
                 TokenTable.address,
@@ -787,5 +992,5 @@ class MinerDBManager:
                 TokenTable.name,
                 TokenTable.decimals
                 ).filter(TokenTable.address == token_address).first()
-            print(f'Token info: {token_info}')
+            logger.debug('Token info: %r', token_info)
             return token_info
\ No newline at end of file
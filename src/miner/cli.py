@@ -6,11 +6,14 @@ from keylimiter import TokenBucketLimiter
 from communex.module.server import ModuleServer
 import uvicorn
 import os
+import logging
 from dotenv import load_dotenv
 
 from src.miner.miner import Miner
 
 load_dotenv()
+# Set LOG_LEVEL=DEBUG to see the per-request debug output
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
 
 app = typer.Typer()
 
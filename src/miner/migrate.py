@@ -0,0 +1,16 @@
+import os
+import logging
+import typer
+from dotenv import load_dotenv
+
+from db.miner_db import MinerDBManager
+
+load_dotenv()
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+
+def migrate():
+    """Create the missing indexes and views on the miner database. Safe to run while the indexer is writing."""
+    MinerDBManager().migrate()
+
+if __name__ == "__main__":
+    typer.run(migrate)
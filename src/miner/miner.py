@@ -4,8 +4,12 @@ from communex.compat.key import classic_load_key
 from keylimiter import TokenBucketLimiter
 
 import os
-import json
+import threading
+import time
+import concurrent.futures
 import hashlib
+import orjson
+import numpy as np
 import pandas as pd
 from datetime import datetime, timezone
 from uniswap_fetcher_rs import UniswapFetcher
@@ -13,13 +17,17 @@ from typing import List
 
 from utils.helpers import unsigned_hex_to_int, signed_hex_to_int
 from utils.protocols import *
-from utils.log import log
+from utils.log import log, logger
 from utils.bfs import breadthFirstSearch
 from src.miner.predict_lstm_model import predict_token_price
 from db.miner_db import MinerDBManager
 
 START_TIMESTAMP = int(datetime(2021, 5, 4).replace(tzinfo=timezone.utc).timestamp())
 DAY = 60 * 60 * 24
+# Seconds between refreshes of the current pool metrics view, one pool metric interval
+CURRENT_POOL_METRIC_REFRESH_INTERVAL = 5 * 60
+# Row layout returned by MinerDBManager.fetch_recent_pool_events
+POOL_EVENT_COLUMNS = ['timestamp', 'pool_address', 'token0_symbol', 'token1_symbol', 'token0_decimals', 'token1_decimals', 'amount0', 'amount1', 'transaction_hash', 'event_type']
 
 class Miner(Module):
     """
@@ -36,69 +44,98 @@ class Miner(Module):
         
         self.uniswap_fetcher_rs = UniswapFetcher(os.getenv('ETHEREUM_RPC_NODE_URL'))
         self.db_manager = MinerDBManager()
+        # Pool addresses only change when new token pairs are synced
+        self._pool_addresses_cache: list[str] | None = None
         
         self.last_synced_time = self.db_manager.lastSyncedTimestamp()
         if self.last_synced_time is None:
             self.last_synced_time = START_TIMESTAMP
         self.sync_token_pairs()
+        
+        # The current pool metrics roll-up is refreshed in the background, never on the request path
+        threading.Thread(target=self.refresh_current_pool_metrics_periodically, daemon=True).start()
+    
+    def refresh_current_pool_metrics_periodically(self) -> None:
+        while True:
+            try:
+                self.db_manager.refresh_current_pool_metrics()
+            except Exception:
+                logger.exception('Failed to refresh the current pool metrics')
+            time.sleep(CURRENT_POOL_METRIC_REFRESH_INTERVAL)
     
     def sync_token_pairs(self) -> None:
         log('Syncing token pairs...')
         
         now = int(datetime.now().timestamp() - 12)
         token_pairs = self.uniswap_fetcher_rs.get_pool_created_events_between_two_timestamps(self.last_synced_time, now)
-        self.db_manager.add_token_pairs(token_pairs, now)
+        inserted_count = self.db_manager.add_token_pairs(token_pairs, now)
+        if inserted_count or self._pool_addresses_cache is None:
+            self._pool_addresses_cache = self.db_manager.fetch_pool_addresses()
+        # The timetable is advanced by the indexer, so pick up its progress on every sync
+        self.db_manager.fetch_completed_time.cache_clear()
         self.last_synced_time = now
         
         log(f'Sync finished until {now}')
+    
+    def get_price_in_usd(self, token_pairs: list[tuple[str, str]], start_timestamp: int, end_timestamp: int, price_count: int) -> np.ndarray:
+        """Multiply the price ratios of every pool along the token path into a price series in USD."""
+        price_in_usd = np.ones(price_count, dtype=np.float64)
+        if not token_pairs:
+            return price_in_usd
+        pool_addresses = self.db_manager.search_pool_addresses(token_pairs)
+        
+        def fetch_price_ratios(token_pair: tuple[str, str]):
+            return self.uniswap_fetcher_rs.get_pool_price_ratios(pool_addresses.get(token_pair), start_timestamp, end_timestamp, 300)
+        
+        # The hops are independent, so fetch them concurrently and fold the results afterwards
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(token_pairs)) as executor:
+            price_ratios = list(executor.map(fetch_price_ratios, token_pairs))
+        for data in price_ratios:
+            ratios = np.fromiter((float(price_ratio['price_ratio']) for price_ratio in data), dtype=np.float64, count=len(data))
+            count = min(len(price_in_usd), len(ratios))
+            price_in_usd = price_in_usd[:count] * ratios[:count]
+        return price_in_usd
 
     @endpoint
     def forwardHealthCheckSynapse(self, synapse: dict):
         time_completed = self.db_manager.fetch_completed_time()['end']
-        token_pairs = self.db_manager.fetch_token_pairs()
-        pool_addresses = [token_pair['pool_address'] for token_pair in token_pairs]
-        # print(f'HealthCheckResponse returned: {time_completed}, {pool_addresses}')
         
-        return HealthCheckResponse(time_completed = time_completed, pool_addresses = pool_addresses).json()
+        return HealthCheckResponse(time_completed = time_completed, pool_addresses = self._pool_addresses_cache).model_dump_json()
         
     @endpoint
     def forwardPoolEventSynapse(self, synapse: dict):
         synapse = PoolEventSynapse(**synapse)
         # Generate a response from scraping the rpc server
         block_number_start, block_number_end = self.uniswap_fetcher_rs.get_block_number_range(synapse.start_datetime, synapse.end_datetime)
-        pool_events = self.db_manager.fetch_pool_events(block_number_start, block_number_end)
-        pool_events_dict = [pool_event.to_dict() for pool_event in pool_events]
-        
-        pool_evnets_string = json.dumps(pool_events_dict)
-        hash_object = hashlib.sha256(pool_evnets_string.encode())  # Convert string to bytes
+        # Hash the events one by one while they are streamed from the database
+        hash_object = hashlib.sha256()
+        pool_events_dict = []
+        for pool_event in self.db_manager.fetch_pool_events(block_number_start, block_number_end):
+            hash_object.update(orjson.dumps(pool_event, option=orjson.OPT_SORT_KEYS))
+            pool_events_dict.append(pool_event)
         hash_hex = hash_object.hexdigest()  # Get the hash as a hexadecimal string
         
-        return PoolEventResponse(data = pool_events_dict, overall_data_hash = hash_hex).json()
+        return PoolEventResponse(data = pool_events_dict, overall_data_hash = hash_hex).model_dump_json()
     
     @endpoint
     def forwardPoolMetricSynapse(self, synapse: dict):
         synapse = PoolMetricSynapse(**synapse)
         pool_metric = self.db_manager.find_pool_metric_timetable_pool_address(synapse.timestamp, synapse.pool_address, synapse.interval)
-        print(f'pool_metric found: {pool_metric}')
-        print(f'pool_metric jsonified: {PoolMetricResponse(**pool_metric).json()}')
-        return PoolMetricResponse(**pool_metric).json()
+        logger.debug('pool_metric found: %r', pool_metric)
+        return PoolMetricResponse(**pool_metric).model_dump_json()
     
     @endpoint
     def forwardPredictionSynapse(self, synapse: PredictionSynapse) -> str:
         synapse = PredictionSynapse(**synapse)
         self.sync_token_pairs()
         token_pairs = breadthFirstSearch(self, synapse.token_address)
-        price_in_usd = [1] * (12 * 24 - 6)
-        for token_pair in token_pairs:
-            pool_address = self.db_manager.search_pool_address(token_pair[0], token_pair[1])
-            data = self.uniswap_fetcher_rs.get_pool_price_ratios(pool_address, synapse.timestamp - DAY, synapse.timestamp - 30 * 60, 300)
-            price_in_usd = [price_in_usd[i] * float(data[i]['price_ratio']) for i in range(len(data))]
+        price_in_usd = self.get_price_in_usd(token_pairs, synapse.timestamp - DAY, synapse.timestamp - 30 * 60, 12 * 24 - 6)
         
-        price_history = pd.DataFrame(price_in_usd, columns=['close_price'])
+        price_history = pd.DataFrame({'close_price': price_in_usd})
         prices = predict_token_price(price_history)
         prices = prices.tolist()
-        print(f"prices: {prices}")
-        return PredictionResponse(prices=prices).json()
+        logger.debug('prices: %r', prices)
+        return PredictionResponse(prices=prices).model_dump_json()
     
     @endpoint
     def forwardCurrentPoolMetricSynapse(self, synapse: CurrentPoolMetricSynapse):
@@ -106,7 +143,7 @@ class Miner(Module):
         db_data = self.db_manager.fetch_current_pool_metrics(synapse.page_limit, synapse.page_number, synapse.search_query, synapse.sort_by, synapse.sort_order)
         pool_metrics = db_data['pool_metrics']
         total_pool_count = db_data['total_pool_count']
-        print(f'current_pool_metrics: {pool_metrics}')
+        logger.debug('current_pool_metrics: %r', pool_metrics)
         data =  [CurrentPoolMetric(
             pool_address=current_pool_metric["pool_address"],
             liquidity_token0=current_pool_metric["liquidity_token0"],
@@ -121,34 +158,33 @@ class Miner(Module):
             token0_price=current_pool_metric["token0_price"],
             token1_price=current_pool_metric["token1_price"],
             ) for current_pool_metric in pool_metrics]
-        return CurrentPoolMetricResponse(data = data, overall_data_hash = "", total_pool_count=total_pool_count).json()
+        return CurrentPoolMetricResponse(data = data, overall_data_hash = "", total_pool_count=total_pool_count).model_dump_json()
     
     @endpoint
     def forwardRecentPoolEventSynapse(self, synapse: RecentPoolEventSynapse):
         synapse = RecentPoolEventSynapse(**synapse)
         pool_events = self.db_manager.fetch_recent_pool_events(synapse.page_limit, synapse.filter_by)
-        print(f'pool_events: {pool_events}')
-        pool_events_dict = [
-            PoolEvent(
-                timestamp=timestamp,
-                pool_address=pool_address,
-                token0_symbol=token0_symbol,
-                token1_symbol=token1_symbol,
-                amount0=float(signed_hex_to_int(amount0)) / 10 ** token0_decimals if event_type == 'swap' else float(unsigned_hex_to_int(amount0)) / 10 ** token0_decimals,
-                amount1=float(signed_hex_to_int(amount1)) / 10 ** token1_decimals if event_type == 'swap' else float(unsigned_hex_to_int(amount1)) / 10 ** token1_decimals,
-                event_type=event_type,
-                transaction_hash=transaction_hash
+        logger.debug('pool_events: %r', pool_events)
+        pool_events = pd.DataFrame(pool_events, columns=POOL_EVENT_COLUMNS)
+        # Swap amounts are signed, mint and burn amounts are unsigned
+        is_swap = pool_events['event_type'].eq('swap').to_numpy()
+        for amount, decimals in (('amount0', 'token0_decimals'), ('amount1', 'token1_decimals')):
+            raw_amounts = np.fromiter(
+                (float(signed_hex_to_int(value) if swap else unsigned_hex_to_int(value)) for value, swap in zip(pool_events[amount], is_swap)),
+                dtype=np.float64,
+                count=len(pool_events),
             )
-            for timestamp, pool_address, token0_symbol, token1_symbol, token0_decimals, token1_decimals, amount0, amount1, transaction_hash, event_type in pool_events]
+            pool_events[amount] = raw_amounts / np.power(10.0, pool_events[decimals].to_numpy(dtype=np.float64))
+        pool_events_dict = pool_events.drop(columns=['token0_decimals', 'token1_decimals']).to_dict(orient='records')
         # print(f'pool_events_dict: {pool_events_dict}')
-        return RecentPoolEventResponse(data = pool_events_dict, overall_data_hash = "").json()
+        return RecentPoolEventResponse(data = pool_events_dict, overall_data_hash = "").model_dump_json()
     @endpoint
     def forwardCurrentTokenMetricSynapse(self, synapse: CurrentTokenMetricSynapse):
         synapse = CurrentTokenMetricSynapse(**synapse)
         db_data = self.db_manager.fetch_current_token_metrics(synapse.page_limit, synapse.page_number, synapse.search_query, synapse.sort_by)
         token_metrics = db_data['token_metrics']
         total_token_count = db_data['total_token_count']
-        print(f'token_metrics: {token_metrics}')
+        logger.debug('token_metrics: %r', token_metrics)
         
         data = [CurrentTokenMetric(
             token_address=token_metric.token_address,
@@ -157,7 +193,7 @@ class Miner(Module):
             total_volume=token_metric.total_volume,
             total_liquidity=token_metric.total_liquidity
             ) for token_metric in token_metrics]
-        return CurrentTokenMetricResponse(data = data, total_token_count = total_token_count).json()
+        return CurrentTokenMetricResponse(data = data, total_token_count = total_token_count).model_dump_json()
     
     @endpoint
     def forwardPoolMetricAPISynapse(self, synapse: PoolMetricAPISynapse):
@@ -166,7 +202,7 @@ class Miner(Module):
         pool_metrics = db_data['pool_metrics']
         total_pool_count = db_data['total_pool_count']
         token_pair_info = db_data['token_pair_info']
-        print(f"token_pair_info: {token_pair_info}")
+        logger.debug('token_pair_info: %r', token_pair_info)
         token_pair_data = TokenPairData(
             token0_price=token_pair_info.token0_price,
             token1_price=token_pair_info.token1_price,
@@ -185,8 +221,8 @@ class Miner(Module):
             volume_token0=pool_metric.volume_token0,
             volume_token1=pool_metric.volume_token1,
             ) for pool_metric in pool_metrics]
-        print(f"total_pool_count: {total_pool_count}")
-        return PoolMetricAPIResponse(data = data, token_pair_data=token_pair_data, total_pool_count = total_pool_count).json()
+        logger.debug('total_pool_count: %r', total_pool_count)
+        return PoolMetricAPIResponse(data = data, token_pair_data=token_pair_data, total_pool_count = total_pool_count).model_dump_json()
     
     @endpoint
     def forwardTokenMetricAPISynapse(self, synapse: TokenMetricAPISynapse):
@@ -195,7 +231,7 @@ class Miner(Module):
         token_metrics = db_data['token_metrics']
         total_token_count = db_data['total_token_count']
         token_data = db_data['token_data']
-        print(f"token_data: {token_data}")
+        logger.debug('token_data: %r', token_data)
         token_data = TokenData(
             token_address=token_data.address,
             symbol=token_data.symbol,
@@ -209,8 +245,8 @@ class Miner(Module):
             total_volume=token_metric.total_volume,
             total_liquidity=token_metric.total_liquidity,
             ) for token_metric in token_metrics]
-        print(f"total_token_count: {total_token_count}")
-        return TokenMetricAPIResponse(data = data, token_data=token_data, total_token_count = total_token_count).json()
+        logger.debug('total_token_count: %r', total_token_count)
+        return TokenMetricAPIResponse(data = data, token_data=token_data, total_token_count = total_token_count).model_dump_json()
     
     @endpoint
     def forwardSwapEventAPISynapse(self, synapse: SwapEventAPISynapse):
@@ -231,7 +267,7 @@ class Miner(Module):
             "liquidity": pool_event.liquidity,
             "tick": pool_event.tick,
             } for pool_event in pool_events]
-        return SwapEventAPIResponse(data = data, total_event_count = total_swap_count).json()
+        return SwapEventAPIResponse(data = data, total_event_count = total_swap_count).model_dump_json()
     @endpoint
     def forwardMintEventAPISynapse(self, synapse: MintEventAPISynapse):
         synapse = MintEventAPISynapse(**synapse)
@@ -251,11 +287,11 @@ class Miner(Module):
             "amount0": pool_event.amount0,
             "amount1": pool_event.amount1,
             } for pool_event in pool_events]
-        return MintEventAPIResponse(data = data, total_event_count = total_mint_count).json()
+        return MintEventAPIResponse(data = data, total_event_count = total_mint_count).model_dump_json()
     @endpoint
     def forwardBurnEventAPISynapse(self, synapse: BurnEventAPISynapse):
         synapse = BurnEventAPISynapse(**synapse)
-        print(f"synapse: {synapse}")
+        logger.debug('synapse: %r', synapse)
         db_data = self.db_manager.fetch_burn_event_api(synapse.page_limit, synapse.page_number, synapse.pool_address, synapse.start_timestamp, synapse.end_timestamp)
         pool_events = db_data['burn_events']
         total_burn_count = db_data['total_burn_count']
@@ -272,26 +308,22 @@ class Miner(Module):
             "amount1": pool_event.amount1,
             
             } for pool_event in pool_events]
-        return BurnEventAPIResponse(data = data, total_event_count = total_burn_count).json()
+        return BurnEventAPIResponse(data = data, total_event_count = total_burn_count).model_dump_json()
     
     @endpoint
     def forwardPredictionAPISynapse(self, synapse: PredictionAPISynapse) -> str:
         synapse = PredictionAPISynapse(**synapse)
         self.sync_token_pairs()
         token_pairs = breadthFirstSearch(self, synapse.token_address)
-        price_in_usd = [1] * (12 * 24)
-        for token_pair in token_pairs:
-            pool_address = self.db_manager.search_pool_address(token_pair[0], token_pair[1])
-            data = self.uniswap_fetcher_rs.get_pool_price_ratios(pool_address, synapse.timestamp - DAY, synapse.timestamp, 300)
-            price_in_usd = [price_in_usd[i] * float(data[i]["price_ratio"]) for i in range(len(data)) if i < 12 * 24]
+        price_in_usd = self.get_price_in_usd(token_pairs, synapse.timestamp - DAY, synapse.timestamp, 12 * 24)
         
-        price_history = pd.DataFrame(price_in_usd, columns=['close_price'])
+        price_history = pd.DataFrame({'close_price': price_in_usd})
         predicted_prices = predict_token_price(price_history)
         predicted_prices = predicted_prices.tolist()
         predicted_data = [ {"timestamp": synapse.timestamp + i * 300, "price": predicted_prices[i]} for i in range(len(predicted_prices))]
-        historical_data = [ {"timestamp": synapse.timestamp - DAY + i * 300, "price": price_in_usd[i]} for i in range(len(price_in_usd))][-10:]
+        historical_data = [ {"timestamp": synapse.timestamp - DAY + i * 300, "price": price} for i, price in enumerate(price_in_usd.tolist())][-10:]
         token_symbol = self.db_manager.get_token_info(synapse.token_address).symbol
-        return PredictionAPIResponse( historical_data=historical_data, predicted_data=predicted_data, token_symbol=token_symbol).json()
+        return PredictionAPIResponse( historical_data=historical_data, predicted_data=predicted_data, token_symbol=token_symbol).model_dump_json()
 
 if __name__ == "__main__":
     """
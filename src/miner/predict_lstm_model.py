@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 from pandas import DataFrame
 import joblib
+from utils.log import logger
 
 from ta.trend import MACD
 from ta.momentum import RSIIndicator, ROCIndicator
@@ -31,11 +32,11 @@ def extract_features(input):
     input['RSI'] = RSIIndicator(input['close_price']).rsi()
     # input['Momentum'] = ROCIndicator(input['close_price']).roc()
     input['MACD'] = MACD(input['close_price']).macd()
-    print(input)
+    logger.debug('features: %r', input)
 
     input.replace([np.inf, -np.inf], np.nan, inplace = True)        
     input.dropna(inplace = True)
-    print(input)
+    logger.debug('features without missing values: %r', input)
     
     return input
 
@@ -60,8 +61,7 @@ def predict(X, y_scaler) -> np.ndarray:
     predicted_prices = model.predict(X)
     predicted_prices = y_scaler.inverse_transform(predicted_prices)
     
-    print('-------------------------------------------')
-    print(predicted_prices)
+    logger.debug('predicted prices: %r', predicted_prices)
     
     return predicted_prices
 
@@ -5,4 +5,5 @@ class ValidatorSettings(BaseSettings):
     # == Scoring ==
     iteration_interval: int = 60  # Set, accordingly to your tempo.
     max_allowed_weights: int = 400  # Query dynamically based on your subnet settings.
+    miner_info_ttl: int = 600  # Seconds to reuse the miner addresses and keys queried from the chain, several iteration intervals.
     foo: int | None = None  # Anything else that you wish to implement.
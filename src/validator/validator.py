@@ -11,7 +11,6 @@ Classes:
 Functions:
     set_weights: Blockchain call to set weights for miners based on their scores.
     cut_to_max_allowed_weights: Cut the scores to the maximum allowed weights.
-    extract_address: Extract an address from a string.
     get_subnet_netuid: Retrieve the network UID of the subnet.
     get_ip_port: Get the IP and port information from module addresses.
 
@@ -20,8 +19,7 @@ Constants:
 """
 
 import asyncio
-import concurrent.futures
-import json
+import heapq
 import re
 import time
 from functools import partial
@@ -52,6 +50,8 @@ from utils.helpers import (
 
 import random
 import os
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 import wandb
 
@@ -59,7 +59,7 @@ from db.validator_db import ValidatorDBManager
 
 load_dotenv()
 
-IP_REGEX = re.compile(r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+")
+IP_REGEX = re.compile(r"(?P<ip>\d{1,3}(?:\.\d{1,3}){3}):(?P<port>\d+)")
 
 EPS = 1e-10
 START_TIMESTAMP = int(datetime(2021, 5, 4).timestamp())
@@ -69,6 +69,17 @@ DAY_SECONDS = 86400
 PREDICTION_SYNAPSE_INTERVAL = 30 * 60
 PREDICTION_CHECK_DELAY = 60
 
+MAX_CONCURRENT_MINER_CALLS = 64
+
+# miner endpoint for each synapse type the validator sends
+FORWARD_ENDPOINTS = {
+    synapse_class: f"forward{synapse_class.__name__}"
+    for synapse_class in (HealthCheckSynapse, PoolEventSynapse, PoolMetricSynapse, PredictionSynapse)
+}
+
+BLOCK_RANGE_CACHE_SIZE = 8192
+BLOCK_RANGE_FINALITY_SECONDS = 5 * 60
+
 def check_url_testnet(url: str):
     mainnet_urls = ComxSettings().NODE_URLS
 
@@ -99,27 +110,22 @@ def set_weights(
     # you can replace with `max_allowed_weights` with the amount your subnet allows
     score_dict = cut_to_max_allowed_weights(score_dict, settings.max_allowed_weights)
 
-    # Create a new dictionary to store the weighted scores
-    weighted_scores: dict[int, int] = {}
-
-    # Calculate the sum of all inverted scores
-    scores = sum(score_dict.values())
-
-    # process the scores into weights of type dict[int, int] 
-    # Iterate over the items in the score_dict
-    for uid, score in score_dict.items():
-        # Calculate the normalized weight as an integer
-        weight = int(score * 1000 / scores)
-
-        # Add the weighted score to the new dictionary
-        weighted_scores[uid] = weight
+    uids = np.fromiter(score_dict.keys(), dtype=np.int64, count=len(score_dict))
+    scores = np.fromiter(score_dict.values(), dtype=np.float64, count=len(score_dict))
+    if scores.sum() <= 0:
+        log('No positive scores to set weights from')
+        return
 
+    # normalize the scores to integer weights summing to exactly 1000 (largest remainder rounding)
+    normalized = scores * 1000.0 / scores.sum()
+    weights = normalized.astype(np.int64)
+    remainder = 1000 - int(weights.sum())
+    weights[np.argsort(-(normalized - weights), kind='stable')[:remainder]] += 1
 
     # filter out 0 weights
-    weighted_scores = {k: v for k, v in weighted_scores.items() if v != 0}
-
-    uids = list(weighted_scores.keys())
-    weights = list(weighted_scores.values())
+    mask = weights > 0
+    uids = uids[mask].tolist()
+    weights = weights[mask].tolist()
     # send the blockchain call
     attempts = 10
     while attempts:
@@ -147,20 +153,11 @@ def cut_to_max_allowed_weights(
     Returns:
         A dictionary mapping miner UIDs to their scores, where the scores have been cut to the maximum allowed weights.
     """
-    # sort the score by highest to lowest
-    sorted_scores = sorted(score_dict.items(), key=lambda x: x[1], reverse=True)
-
-    # cut to max_allowed_weights
-    cut_scores = sorted_scores[:max_allowed_weights]
+    # keep the max_allowed_weights highest scores, from highest to lowest
+    cut_scores = heapq.nlargest(max_allowed_weights, score_dict.items(), key=lambda x: x[1])
 
     return dict(cut_scores)
 
-def extract_address(string: str):
-    """
-    Extracts an address from a string.
-    """
-    return re.search(IP_REGEX, string)
-
 def get_subnet_netuid(clinet: CommuneClient, subnet_name: str = "replace-with-your-subnet-name"):
     """
     Retrieve the network UID of the subnet.
@@ -182,7 +179,7 @@ def get_subnet_netuid(clinet: CommuneClient, subnet_name: str = "replace-with-yo
             return netuid
     raise ValueError(f"Subnet {subnet_name} not found")
 
-def get_ip_port(modules_adresses: dict[int, str]):
+def get_ip_port(modules_adresses: dict[int, str]) -> dict[int, tuple[str, int]]:
     """
     Get the IP and port information from module addresses.
 
@@ -190,14 +187,14 @@ def get_ip_port(modules_adresses: dict[int, str]):
         modules_addresses: A dictionary mapping module IDs to their addresses.
 
     Returns:
-        A dictionary mapping module IDs to their IP and port information.
+        A dictionary mapping module IDs to their (IP, port) pair.
     """
 
-    filtered_addr = {id: extract_address(addr) for id, addr in modules_adresses.items()}
-    ip_port = {
-        id: x.group(0).split(":") for id, x in filtered_addr.items() if x is not None
+    return {
+        id: (match.group("ip"), int(match.group("port")))
+        for id, addr in modules_adresses.items()
+        if (match := IP_REGEX.search(addr))
     }
-    return ip_port
 class VeloraValidator(Module):
     """
     A class for validating text generated by modules in a subnet.
@@ -231,8 +228,15 @@ class VeloraValidator(Module):
         self.key = key
         self.netuid = netuid
         self.call_timeout = call_timeout
+        self._miner_info_cache: tuple[float, dict] | None = None
         
         self.uniswap_fetcher_rs = UniswapFetcher(os.getenv('ETHEREUM_RPC_NODE_URL'))
+        # (start_timestamp, end_timestamp) -> block number range, kept across validation steps
+        self._block_number_ranges: dict[tuple[int, int], tuple[int, int]] = {}
+        # (start_timestamp, end_timestamp) -> block number range lookups in flight during the current step
+        self._block_number_range_requests: dict[tuple[int, int], asyncio.Task] = {}
+        # (pool_address, block_start, block_end) -> on-chain (block_number, transaction_hash) keys lookup, cleared at the start of every validation step
+        self._pool_event_cache: dict[tuple[str, int, int], asyncio.Task] = {}
         self.wandb_running = False
         self.db_manager = ValidatorDBManager()
 
@@ -284,14 +288,31 @@ class VeloraValidator(Module):
         module_addreses = client.query_map_address(netuid)
         return module_addreses
     
-    def retrieve_miner_information(self, velora_netuid):
-        modules_adresses = self.get_addresses(self.client, velora_netuid)
-        modules_keys = self.client.query_map_key(velora_netuid)
+    def invalidate_miner_cache(self):
+        """
+        Drop the cached miner information so the next step queries the chain again.
+        """
+        self._miner_info_cache = None
+
+    async def retrieve_miner_information(self, velora_netuid, settings: ValidatorSettings):
+        """
+        Retrieve the connection information and key of every miner in the subnet.
+
+        The result is reused for `settings.miner_info_ttl` seconds, as the miner set only changes between epochs.
+        """
+        if self._miner_info_cache is not None and time.monotonic() - self._miner_info_cache[0] < settings.miner_info_ttl:
+            return self._miner_info_cache[1]
+
+        # the two chain queries are independent, run them concurrently off the event loop
+        modules_adresses, modules_keys = await asyncio.gather(
+            asyncio.to_thread(self.get_addresses, self.client, velora_netuid),
+            asyncio.to_thread(self.client.query_map_key, velora_netuid),
+        )
         val_ss58 = self.key.ss58_address
         if val_ss58 not in modules_keys.values():
             raise RuntimeError(f"validator key {val_ss58} is not registered in subnet")
 
-        modules_info: dict[int, tuple[list[str], Ss58Address]] = {}
+        modules_info: dict[int, tuple[tuple[str, int], Ss58Address]] = {}
 
         modules_filtered_address = get_ip_port(modules_adresses)
         for module_id in modules_keys.keys():
@@ -299,58 +320,84 @@ class VeloraValidator(Module):
             if not module_addr:
                 continue
             modules_info[module_id] = (module_addr, modules_keys[module_id])
+
+        self._miner_info_cache = (time.monotonic(), modules_info)
         return modules_info
 
-    def _get_miner_prediction(
+    async def _get_miner_prediction(
         self,
         synapse,
-        miner_info: tuple[list[str], Ss58Address],
-    ) -> str | None:
+        miner_info: tuple[tuple[str, int], Ss58Address],
+        payload: dict | None = None,
+    ) -> dict | None:
         """
         Prompt a miner module to generate an answer to the given question.
 
         Args:
             question: The question to ask the miner module.
             miner_info: A tuple containing the miner's connection information and key.
+            payload: The already serialized synapse, when it is shared by several miners.
 
         Returns:
             The generated answer from the miner module, or None if the miner fails to generate an answer.
         """
         connection, miner_key = miner_info
         module_ip, module_port = connection
-        client = ModuleClient(module_ip, int(module_port), self.key)
+        # resolved outside the try, so an unknown synapse type raises to the caller instead of being logged as a miner failure
+        endpoint = FORWARD_ENDPOINTS[type(synapse)]
+        client = ModuleClient(module_ip, module_port, self.key)
+        if payload is None:
+            payload = synapse.model_dump(mode="json")
         try:
             # handles the communication with the miner
-            current_time = datetime.now()
+            start_time = time.perf_counter()
             miner_answer = dict()
-            response = asyncio.run(
+            # wait_for bounds the whole call and cancels it on expiry; the client timeout is kept so
+            # communex's shorter default doesn't cut the request first
+            response = await asyncio.wait_for(
                 client.call(
-                    f'forward{synapse.class_name}',
+                    endpoint,
                     miner_key,
-                    {"synapse": synapse.dict()},
+                    {"synapse": payload},
                     timeout=self.call_timeout,  #  type: ignore
-                )
+                ),
+                timeout=self.call_timeout,
             )
-            response = json.loads(response)
+            response = orjson.loads(response)
             miner_answer['data'] = class_dict[response['class_name']](**response)
                 
-            process_time = datetime.now() - current_time
-            miner_answer["process_time"] = process_time
+            miner_answer["process_time"] = time.perf_counter() - start_time
 
+        except asyncio.TimeoutError:
+            log(f"Miner {module_ip}:{module_port} timed out after {self.call_timeout}s")
+            miner_answer = None
         except Exception as e:
             log(f"Miner {module_ip}:{module_port} failed to generate an answer")
             print(e)
             miner_answer = None
         return miner_answer
     
-    def get_miner_answer(self, modules_info, synapses):
+    async def get_miner_answer(self, modules_info, synapses):
         if not isinstance(synapses, list):
             synapses = [synapses] * len(modules_info)
-        log(f"Selected the following miners: {modules_info.keys()}")
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-            it = executor.map(lambda x: self._get_miner_prediction(x[0], x[1]), list(zip(synapses, modules_info.values())))
-            answers = [*it]
+        # a synapse broadcast to every miner is serialized only once
+        payloads = {id(synapse): synapse.model_dump(mode="json") for synapse in synapses}
+
+        # All miners are queried concurrently on the running event loop, bounded by the semaphore
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_MINER_CALLS)
+        async def get_answer(synapse, miner_info):
+            async with semaphore:
+                return await self._get_miner_prediction(synapse, miner_info, payloads[id(synapse)])
+
+        answers = await asyncio.gather(
+            *[get_answer(synapse, miner_info) for synapse, miner_info in zip(synapses, modules_info.values())],
+            return_exceptions=True,
+        )
+        for key, answer in zip(modules_info.keys(), answers):
+            if isinstance(answer, BaseException):
+                log(f"Querying miner {key} failed: {answer!r}")
+        answers = [None if isinstance(answer, BaseException) else answer for answer in answers]
             
         if not answers:
             log("No miner managed to give an answer")
@@ -358,30 +405,62 @@ class VeloraValidator(Module):
         
         return answers
         
-    def get_pool_event_synapses(self, healthy_data: list[HealthCheckResponse]) -> list[PoolEventSynapse]:
+    async def _probe_miner(
+        self,
+        key: int,
+        miner_info: tuple[tuple[str, int], Ss58Address],
+        health_check_synapse: HealthCheckSynapse,
+        health_check_payload: dict,
+    ) -> tuple:
         """
-        Generate a prompt for the pool event check.
+        Run the health check on a single miner, then send it its pool event and pool metric synapses.
+
+        The health check synapse and its serialized payload are shared by every miner of the step.
 
         Returns:
-            The list of PoolEventSynapse.
-        """
-        synapses = []
-        for miner_data in healthy_data:
-            if miner_data is None or miner_data['data'] is None: continue
-            miner_data = miner_data['data']
-            days = int((miner_data.time_completed - START_TIMESTAMP) // DAY_SECONDS)
-            random_pick = random.randint(0, days)
-            start_date = random_pick * DAY_SECONDS + START_TIMESTAMP
-            end_date = start_date + DAY_SECONDS
-            pool_addr = random.choice(miner_data.pool_addresses)
-            
-            synapses.append(PoolEventSynapse(pool_address=pool_addr,
-                                             start_datetime=start_date,
-                                             end_datetime=end_date))
+            The (health answer, pool event synapse, pool event answer, pool metric synapse, pool metric answer) tuple.
+            Everything after the health answer is None when the miner failed the health check.
+        """
+        health_data = await self._get_miner_prediction(health_check_synapse, miner_info, health_check_payload)
+        if health_data is None or health_data['data'] is None:
+            return health_data, None, None, None, None
 
-        return synapses
-    
-    def check_miner_answer_pool_event(self, miner_prompt: PoolEventSynapse, miner_answer: PoolEventResponse | None) -> bool:
+        try:
+            pool_event_synapse, pool_metric_event_synapse = self._sample_targets(health_data['data'])
+        except Exception as e:
+            # the health answer is still scored, only the follow-up checks are skipped
+            log(f"Failed to sample the pool event and pool metric targets of miner {key}: {e!r}")
+            return health_data, None, None, None, None
+        pool_event, pool_metric_event = await asyncio.gather(
+            self._get_miner_prediction(pool_event_synapse, miner_info),
+            self._get_miner_prediction(pool_metric_event_synapse, miner_info),
+        )
+        return health_data, pool_event_synapse, pool_event, pool_metric_event_synapse, pool_metric_event
+
+    def _sample_targets(self, miner_data: HealthCheckResponse) -> tuple[PoolEventSynapse, PoolMetricSynapse]:
+        """
+        Generate the pool event and pool_metric event prompts of a single miner in one pass.
+
+        Both synapses target the same randomly picked pool; the pool event synapse covers a random day
+        and the pool metric synapse a random 5 minute slot before the miner's completed time.
+
+        Returns:
+            The PoolEventSynapse and PoolMetricSynapse.
+        """
+        synced_seconds = miner_data.time_completed - START_TIMESTAMP
+        pool_addr = random.choice(miner_data.pool_addresses)
+
+        start_date = random.randint(0, int(synced_seconds // DAY_SECONDS)) * DAY_SECONDS + START_TIMESTAMP
+        timestamp = random.randint(0, int(synced_seconds // POOL_METRIC_INTERVAL)) * POOL_METRIC_INTERVAL + START_TIMESTAMP
+
+        pool_event_synapse = PoolEventSynapse(pool_address=pool_addr,
+                                              start_datetime=start_date,
+                                              end_datetime=start_date + DAY_SECONDS)
+        pool_metric_event_synapse = PoolMetricSynapse(pool_address=pool_addr,
+                                                      timestamp=timestamp, interval=POOL_METRIC_INTERVAL)
+        return pool_event_synapse, pool_metric_event_synapse
+
+    async def check_miner_answer_pool_event(self, miner_prompt: PoolEventSynapse, miner_answer: PoolEventResponse | None) -> bool:
         """
         Check if the miner answers are valid.
         
@@ -393,36 +472,69 @@ class VeloraValidator(Module):
         start_datetime = miner_prompt.start_datetime
         end_datetime = miner_prompt.end_datetime
         
-        block_number_start, block_number_end = self.uniswap_fetcher_rs.get_block_number_range(start_datetime, end_datetime)
+        block_number_start, block_number_end = await self._get_block_number_range(start_datetime, end_datetime)
         
         miner_data = miner_answer.data
         if not miner_data:
             return False
         ANSWER_CHECK_COUNT = 10
-        correct_count = 0
-        for _ in range(ANSWER_CHECK_COUNT):
-            block_data = random.choice(miner_data)
-            block_number = block_data.get("block_number", None)
-            
-            if block_number is None:
-                return False
-            if block_number < block_number_start or block_number > block_number_end:
-                return False
-            
-            okay = 0
-            block_data_from_pools = self.uniswap_fetcher_rs.get_pool_events_by_pool_addresses([pool_address], block_number, block_number)
-            for block_data_of_pool in block_data_from_pools.get("data", []):
-                if block_data_of_pool.get("transaction_hash") == block_data.get("transaction_hash"):
-                    okay = 1
-            correct_count += okay
-        return correct_count / ANSWER_CHECK_COUNT
+        samples = random.sample(miner_data, k=min(ANSWER_CHECK_COUNT, len(miner_data)))
+        if not all(
+            block_data.get("block_number") is not None and block_number_start <= block_data["block_number"] <= block_number_end
+            for block_data in samples
+        ):
+            return False
+
+        pool_event_keys = await self._get_pool_event_keys(pool_address, block_number_start, block_number_end)
+        correct_count = sum(1 for block_data in samples if (block_data["block_number"], block_data.get("transaction_hash")) in pool_event_keys)
+        return correct_count / len(samples)
+
+    async def _get_block_number_range(self, start_timestamp: int, end_timestamp: int) -> tuple[int, int]:
+        """
+        Get the block number range of a timestamp range, reusing the ranges resolved in earlier steps.
+
+        Ranges ending within BLOCK_RANGE_FINALITY_SECONDS of now are not cached, as their end block can still move.
+        """
+        cache_key = (start_timestamp, end_timestamp)
+        block_number_range = self._block_number_ranges.get(cache_key)
+        if block_number_range is None:
+            # concurrent lookups of the same range share one request
+            if cache_key not in self._block_number_range_requests:
+                self._block_number_range_requests[cache_key] = asyncio.ensure_future(
+                    asyncio.to_thread(self.uniswap_fetcher_rs.get_block_number_range, start_timestamp, end_timestamp)
+                )
+            block_number_range = await self._block_number_range_requests[cache_key]
+            if end_timestamp < time.time() - BLOCK_RANGE_FINALITY_SECONDS:
+                if len(self._block_number_ranges) >= BLOCK_RANGE_CACHE_SIZE:
+                    # drop the oldest entry
+                    self._block_number_ranges.pop(next(iter(self._block_number_ranges)))
+                self._block_number_ranges[cache_key] = block_number_range
+        return block_number_range
+
+    async def _get_pool_event_keys(self, pool_address: str, block_number_start: int, block_number_end: int) -> set[tuple[int, str]]:
+        """
+        Get the (block_number, transaction_hash) keys of the on-chain pool events in a block range, reusing the results fetched earlier in this step.
+        """
+        async def fetch_pool_event_keys():
+            pool_events = await asyncio.to_thread(self.uniswap_fetcher_rs.get_pool_events_by_pool_addresses, [pool_address], block_number_start, block_number_end)
+            return {(event.get("block_number"), event.get("transaction_hash")) for event in pool_events.get("data", [])}
+
+        cache_key = (pool_address, block_number_start, block_number_end)
+        # the task is cached rather than its result, so concurrent checks of the same range share one request
+        if cache_key not in self._pool_event_cache:
+            self._pool_event_cache[cache_key] = asyncio.ensure_future(fetch_pool_event_keys())
+        return await self._pool_event_cache[cache_key]
 
-    def get_pool_metric_by_pool_address(self, pool_address: str, timestamp: int, interval: int, token0_decimals: int, token1_decimals: int) -> dict:
+    async def get_pool_metric_by_pool_address(self, pool_address: str, timestamp: int, interval: int, token0_decimals: int, token1_decimals: int) -> dict:
         """
         Get the pool metrics by pool address.
         """
-        start_block_number, end_block_number = self.uniswap_fetcher_rs.get_block_number_range(timestamp - interval, timestamp)
-        pool_events = self.uniswap_fetcher_rs.get_pool_events_by_pool_addresses([pool_address], start_block_number, end_block_number)
+        # the price ratios don't depend on the block range, so they are fetched alongside it
+        (start_block_number, end_block_number), price_ratios = await asyncio.gather(
+            self._get_block_number_range(timestamp - interval, timestamp),
+            asyncio.to_thread(self.uniswap_fetcher_rs.get_pool_price_ratios, pool_address, timestamp - interval, timestamp, interval),
+        )
+        pool_events = await asyncio.to_thread(self.uniswap_fetcher_rs.get_pool_events_by_pool_addresses, [pool_address], start_block_number, end_block_number)
         aggregated_data = {
             "total_liquidity": [],
             "token0_liquidity": [],
@@ -456,9 +568,9 @@ class VeloraValidator(Module):
                 aggregated_data["token1_liquidity"].append(liquidity_token1)
                 aggregated_data["total_liquidity"].append(amount)
         volume_token0 = normalize_with_deciamls(
-                sum(apply_abs_to_list(aggregated_data["amount0"])),
-                token0_decimals,
-            )
+            sum(apply_abs_to_list(aggregated_data["amount0"])),
+            token0_decimals,
+        )
         volume_token1 = normalize_with_deciamls(
             sum(apply_abs_to_list(aggregated_data["amount1"])),
             token1_decimals,
@@ -471,34 +583,40 @@ class VeloraValidator(Module):
             sum(aggregated_data["token1_liquidity"]),
             token1_decimals,
         )
-        price_ratios = self.uniswap_fetcher_rs.get_pool_price_ratios(pool_address, timestamp - interval, timestamp, interval)
         price = float(price_ratios[-1].get("price_ratio")) if price_ratios else 0.0
         return {"price": price, "liquidity_token0": liquidity_token0, "liquidity_token1": liquidity_token1, "volume_token0": volume_token0, "volume_token1": volume_token1}
     
 
-    def get_deviations(self, miner_prompt: PoolMetricSynapse, miner_answer: PoolMetricResponse):
+    async def get_deviations(self, miner_prompts: list[PoolMetricSynapse], miner_answers: list[PoolMetricResponse]) -> np.ndarray:
         """
-        Check if the miner answers are valid.
+        Get the deviations of the miner answers from the on-chain pool metrics.
         
         Args:
-            miner_prompt: The prompt for the miner modules.
-            miner_answer: The generated answer from the miner module.
-        """
-        pool_address = miner_prompt.pool_address
-        timestamp = miner_prompt.timestamp
-        print(f'pool_metric_events/miner_answer: {miner_answer}')
-        on_chain_pool_metric = self.get_pool_metric_by_pool_address(pool_address, timestamp, POOL_METRIC_INTERVAL, miner_answer.token0_decimals, miner_answer.token1_decimals)
-        print(f"on_chain_pool_metric: {on_chain_pool_metric}")
-        if miner_answer is None:
-            return False
-        
-        return {
-            'price': abs(on_chain_pool_metric['price'] - miner_answer.price),
-            'liquidity': abs(on_chain_pool_metric['liquidity_token0'] - miner_answer.liquidity_token0 + on_chain_pool_metric['liquidity_token1'] - miner_answer.liquidity_token1),
-            'volume': abs(on_chain_pool_metric['volume_token0'] - miner_answer.volume_token0 + on_chain_pool_metric['volume_token1'] - miner_answer.volume_token1),
-        }
+            miner_prompts: The prompts for the miner modules.
+            miner_answers: The generated answers from the miner modules.
 
-    def check_pool_event_accuracy(self, synapse: PoolEventSynapse, miner_answer: PoolEventResponse) -> float:
+        Returns:
+            The (N, 3) array of price, liquidity and volume deviations, aligned with the answers.
+        """
+        on_chain_pool_metrics = await asyncio.gather(*[
+            self.get_pool_metric_by_pool_address(miner_prompt.pool_address, miner_prompt.timestamp, POOL_METRIC_INTERVAL, miner_answer.token0_decimals, miner_answer.token1_decimals)
+            for miner_prompt, miner_answer in zip(miner_prompts, miner_answers)
+        ])
+        for miner_answer, on_chain_pool_metric in zip(miner_answers, on_chain_pool_metrics):
+            log(f'pool_metric_events/miner_answer: {miner_answer}')
+            log(f'on_chain_pool_metric: {on_chain_pool_metric}')
+
+        on_chain = np.asarray([
+            (metric['price'], metric['liquidity_token0'] + metric['liquidity_token1'], metric['volume_token0'] + metric['volume_token1'])
+            for metric in on_chain_pool_metrics
+        ], dtype=float)
+        answered = np.asarray([
+            (answer.price, answer.liquidity_token0 + answer.liquidity_token1, answer.volume_token0 + answer.volume_token1)
+            for answer in miner_answers
+        ], dtype=float)
+        return np.abs(on_chain - answered)
+
+    async def check_pool_event_accuracy(self, synapse: PoolEventSynapse, miner_answer: PoolEventResponse) -> float:
         """
         Score the generated answer against the validator's own answer.
 
@@ -515,35 +633,14 @@ class VeloraValidator(Module):
         
         # count the number of correct entries
 
-        accuracy_score = self.check_miner_answer_pool_event(synapse, miner_answer)
-        print(f'pool_events/accuracy_score: {accuracy_score}')
+        accuracy_score = await self.check_miner_answer_pool_event(synapse, miner_answer)
+        log(f'pool_events/accuracy_score: {accuracy_score}')
         
         accuracy_score = (max((accuracy_score - 0.75), 0) * 4) ** 3
 
         return accuracy_score
 
-    def get_pool_metric_event_synapse(self, healthy_data: list[HealthCheckResponse]) -> list[PoolMetricSynapse]:
-        """
-        Generate a prompt for the pool_metric event check.
-        
-        Returns:
-            The list of PoolMetricSynapse.
-        """
-        synapses = []
-        for miner_data in healthy_data:
-            if miner_data is None or miner_data['data'] is None: continue
-            miner_data = miner_data['data']
-            days = int((miner_data.time_completed - START_TIMESTAMP) / (POOL_METRIC_INTERVAL))
-            random_pick = random.randint(0, days)
-            timestamp = random_pick * 300 + START_TIMESTAMP
-            pool_addr = random.choice(miner_data.pool_addresses)
-            
-            synapses.append(PoolMetricSynapse(pool_address=pool_addr,
-                                               timestamp=timestamp, interval=POOL_METRIC_INTERVAL))
-
-        return synapses
-
-    def score_pool_events(self, synapses, miner_results):
+    async def score_pool_events(self, synapses, miner_results):
         """
         Score the miners based on their answers.
         
@@ -551,33 +648,27 @@ class VeloraValidator(Module):
             synapses: synapses for each miner
             miner_results: The results of the miner modules.
         """
-        process_time_score = {}
-        accuracy_score: dict[int, float] = {}
-        
-        for synapse, (key, miner_answer) in zip(synapses, miner_results):
-            if not miner_answer:
-                log(f"Skipping miner {key} that didn't answer")
-                continue
-            process_time_score[key] = miner_answer["process_time"].total_seconds()
-
-            score = self.check_pool_event_accuracy(synapse, miner_answer['data'])
-            time.sleep(0.5)
-            # score has to be lower or eq to 1, as one is the best score, you can implement your custom logic
-            assert score <= 1
-            accuracy_score[key] = score
-
-        if(len(process_time_score) == 0):
+        valid = [(key, miner_answer, synapse) for synapse, (key, miner_answer) in zip(synapses, miner_results) if miner_answer]
+        if len(valid) < len(miner_results):
+            log(f"Skipping miners that didn't answer: {[key for key, miner_answer in miner_results if not miner_answer]}")
+        if len(valid) == 0:
             return {}
+
+        keys = [key for key, _, _ in valid]
+        process_times = np.fromiter((miner_answer["process_time"] for _, miner_answer, _ in valid), dtype=float, count=len(valid))
+        accuracies = np.asarray(await asyncio.gather(
+            *[self.check_pool_event_accuracy(synapse, miner_answer['data']) for _, miner_answer, synapse in valid]
+        ), dtype=float)
+        # score has to be lower or eq to 1, as one is the best score, you can implement your custom logic
+        assert (accuracies <= 1).all()
         
-        max_time = max(process_time_score.values())
-        min_time = min(process_time_score.values())
-        process_time_score = {key: 1 - 0.5 * (process_time - min_time) / (max_time - min_time + EPS) for key, process_time in process_time_score.items()}
+        process_time_score = 1 - 0.5 * (process_times - process_times.min()) / (process_times.max() - process_times.min() + EPS)
             
-        print(f'pool_events:process_time_score: {process_time_score}')
-        print(f'pool_events:accuracy_score: {accuracy_score}')
-        overall_score = {key: ((accuracy_score[key] + process_time_score[key]) / 2) for key in accuracy_score.keys()}
+        log(f'pool_events:process_time_score: {dict(zip(keys, process_time_score.tolist()))}')
+        log(f'pool_events:accuracy_score: {dict(zip(keys, accuracies.tolist()))}')
+        overall_score = (accuracies + process_time_score) / 2
         
-        return overall_score
+        return dict(zip(keys, overall_score.tolist()))
     
     def score_health_check(self, miner_results):
         valid_miner_results = [(key, miner_answer) for key, miner_answer in miner_results if miner_answer is not None]
@@ -594,7 +685,7 @@ class VeloraValidator(Module):
         
         return {key: amount_score[key] * 0.6 + recency_score[key] * 0.4 for key in amount_score.keys()}
     
-    def score_pool_metric_events(self, synapses, miner_results):
+    async def score_pool_metric_events(self, synapses, miner_results):
         """
         Score the miners based on their answers.
         
@@ -602,57 +693,31 @@ class VeloraValidator(Module):
             synapses: synapses for each miner
             miner_results: The results of the miner modules.
         """
-        process_time_score = {}
-        deviations: dict[int, float] = {}
-        
-        for synapse, (key, miner_answer) in zip(synapses, miner_results):
-            if not miner_answer:
-                log(f"Skipping miner {key} that didn't answer")
-                continue
-            process_time_score[key] = miner_answer["process_time"].total_seconds()
-
-            deviations[key] = self.get_deviations(synapse, miner_answer['data'])
-            
-        print(f'process_time_score: {process_time_score}')
-        if len(process_time_score) == 0:
+        valid = [(key, miner_answer, synapse) for synapse, (key, miner_answer) in zip(synapses, miner_results) if miner_answer]
+        if len(valid) < len(miner_results):
+            log(f"Skipping miners that didn't answer: {[key for key, miner_answer in miner_results if not miner_answer]}")
+        if len(valid) == 0:
             return {}
+
+        keys = [key for key, _, _ in valid]
+        process_times = np.fromiter((miner_answer["process_time"] for _, miner_answer, _ in valid), dtype=float, count=len(valid))
+        deviations = await self.get_deviations(
+            [synapse for _, _, synapse in valid],
+            [miner_answer['data'] for _, miner_answer, _ in valid],
+        )
         
-        max_time = max(process_time_score.values())
-        min_time = min(process_time_score.values())
-        process_time_score = {key: 1 - 0.5 * (process_time - min_time) / (max_time - min_time + EPS) for key, process_time in process_time_score.items()}
-        
-        def get_min_max_deviations(deviations: dict):
-            min_deviations = {
-                'price': min([deviation['price'] for deviation in deviations.values()]),
-                'liquidity': min([deviation['liquidity'] for deviation in deviations.values()]),
-                'volume': min([deviation['volume'] for deviation in deviations.values()])
-            }
-            max_deviations = {
-                'price': max([deviation['price'] for deviation in deviations.values()]),
-                'liquidity': max([deviation['liquidity'] for deviation in deviations.values()]),
-                'volume': max([deviation['volume'] for deviation in deviations.values()])
-            }
-            return min_deviations, max_deviations
-
-        def get_deviation_scores(deviations, min_deviations, max_deviations):
-            return {key: {
-                'price': 1 - (deviation['price'] - min_deviations['price']) / (max_deviations['price'] - min_deviations['price'] + EPS),
-                'liquidity': 1 - (deviation['liquidity'] - min_deviations['liquidity']) / (max_deviations['liquidity'] - min_deviations['liquidity'] + EPS),
-                'volume': 1 - (deviation['volume'] - min_deviations['volume']) / (max_deviations['volume'] - min_deviations['volume'] + EPS),
-            }
-            for key, deviation in deviations.items()}
-        
-        def get_deviation_score(scores):
-            return {key: (score['price'] + score['liquidity'] + score['volume']) / 3 for key, score in scores.items()}
-        
-        min_deviations, max_deviations = get_min_max_deviations(deviations)
-        deviation_scores = get_deviation_scores(deviations, min_deviations, max_deviations)
-        deviation_score = get_deviation_score(deviation_scores)
+        process_time_score = 1 - 0.5 * (process_times - process_times.min()) / (process_times.max() - process_times.min() + EPS)
+        
+        # (N, 3) matrix of price / liquidity / volume deviations, min-max normalized per column
+        min_deviations = deviations.min(axis=0)
+        max_deviations = deviations.max(axis=0)
+        deviation_scores = 1 - (deviations - min_deviations) / (max_deviations - min_deviations + EPS)
+        deviation_score = deviation_scores.mean(axis=1)
             
-        print(f'pool_metric_events:process_time_score: {process_time_score}')
-        print(f'pool_metric_events:deviation_score: {deviation_score}')
+        log(f'pool_metric_events:process_time_score: {dict(zip(keys, process_time_score.tolist()))}')
+        log(f'pool_metric_events:deviation_score: {dict(zip(keys, deviation_score.tolist()))}')
         
-        overall_score = {key: ((deviation_score[key] + process_time_score[key]) / 2) for key in process_time_score.keys()}
+        overall_score = dict(zip(keys, ((deviation_score + process_time_score) / 2).tolist()))
         
         return overall_score
 
@@ -697,7 +762,7 @@ class VeloraValidator(Module):
         
         log(f'Synced tokens until {self.last_synced_time}')
     
-    def manage_prediction_synapse(self, miner_infos: dict, settings: ValidatorSettings):
+    async def manage_prediction_synapse(self, miner_infos: dict, settings: ValidatorSettings):
         """
         Manages the timeline of prediction synapses.
         """
@@ -730,7 +795,8 @@ class VeloraValidator(Module):
         tokens = self.db_manager.getAvailableTokens()
         
         synapse = PredictionSynapse(timestamp = next_timestamp_to_predict, token_address = random.choice(tokens))
-        miner_results = self.get_miner_answer(miner_infos, synapse)
+        log(f"Selected the following miners for the prediction round: {miner_infos.keys()}")
+        miner_results = await self.get_miner_answer(miner_infos, synapse)
         self.prediction_results = list(zip(miner_infos.keys(), miner_results))
         
     
@@ -748,13 +814,35 @@ class VeloraValidator(Module):
         """
 
         # retrive the miner information
-        modules_info = self.retrieve_miner_information(velora_netuid)
+        modules_info = await self.retrieve_miner_information(velora_netuid, settings)
 
         score_dict: dict[int, float] = {}
-        # Check range
+        self._pool_event_cache.clear()
+        self._block_number_range_requests.clear()
+        log(f"Selected the following miners: {modules_info.keys()}")
+
+        # Each miner gets its pool event and pool metric synapses as soon as its own health check is back
         health_check_synapse = HealthCheckSynapse()
-        health_data = self.get_miner_answer(modules_info, health_check_synapse)
-        miner_results_health_data = list(zip(modules_info.keys(), health_data))
+        health_check_payload = health_check_synapse.model_dump(mode="json")
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_MINER_CALLS)
+        async def probe(key, miner_info):
+            async with semaphore:
+                return await self._probe_miner(key, miner_info, health_check_synapse, health_check_payload)
+
+        probe_results = await asyncio.gather(
+            *[probe(key, miner_info) for key, miner_info in modules_info.items()],
+            return_exceptions=True,
+        )
+        for key, result in zip(modules_info.keys(), probe_results):
+            if isinstance(result, BaseException):
+                log(f"Probing miner {key} failed: {result!r}")
+        probe_results = {
+            key: (None, None, None, None, None) if isinstance(result, BaseException) else result
+            for key, result in zip(modules_info.keys(), probe_results)
+        }
+
+        # Check range
+        miner_results_health_data = [(key, result[0]) for key, result in probe_results.items()]
         
         health_score = self.score_health_check(miner_results_health_data)
         valid_miner_infos = {key: modules_info[key] for key in health_score}
@@ -762,26 +850,27 @@ class VeloraValidator(Module):
         
         if len(valid_miner_infos) == 0:
             log('No valid miners')
+            # the cached addresses may be stale, query the chain again on the next step
+            self.invalidate_miner_cache()
             return
 
+        valid_results = [(key, probe_results[key]) for key in valid_miner_infos.keys()]
+
         # Check pool events data
-        pool_event_check_synapses = self.get_pool_event_synapses(health_data)
-        pool_events = self.get_miner_answer(valid_miner_infos, pool_event_check_synapses)
-        
-        miner_results_pool_events = list(zip(valid_miner_infos.keys(), pool_events))
+        pool_event_check_synapses = [result[1] for _, result in valid_results]
+        miner_results_pool_events = [(key, result[2]) for key, result in valid_results]
 
-        pool_events_score = self.score_pool_events(pool_event_check_synapses, miner_results_pool_events)
-        
         # Check pool_metrics
-        pool_metric_event_synapses = self.get_pool_metric_event_synapse(health_data)
-        pool_metric_events = self.get_miner_answer(valid_miner_infos, pool_metric_event_synapses)
-        
-        miner_results_pool_metric_events = list(zip(valid_miner_infos.keys(), pool_metric_events))
-        
-        pool_metric_events_score = self.score_pool_metric_events(pool_metric_event_synapses, miner_results_pool_metric_events)
-        
-        # Check prediction
-        self.manage_prediction_synapse(valid_miner_infos, settings)
+        pool_metric_event_synapses = [result[3] for _, result in valid_results]
+        miner_results_pool_metric_events = [(key, result[4]) for key, result in valid_results]
+        
+        # The ground truth fetches of both checks run in worker threads, overlapping with the prediction round
+        pool_events_score, pool_metric_events_score, _ = await asyncio.gather(
+            self.score_pool_events(pool_event_check_synapses, miner_results_pool_events),
+            self.score_pool_metric_events(pool_metric_event_synapses, miner_results_pool_metric_events),
+            # Check prediction
+            self.manage_prediction_synapse(valid_miner_infos, settings),
+        )
         
         score_dict = {key: health_score.get(key, 0) * 0.3 + pool_events_score.get(key, 0) * 0.3 + pool_metric_events_score.get(key, 0) * 0.4 for key in valid_miner_infos.keys()}
 
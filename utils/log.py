@@ -1,5 +1,9 @@
 from typing import Literal, Any
 import datetime
+import logging
+
+# Debug output goes through this logger so that its arguments are only formatted when the level is enabled
+logger = logging.getLogger("velora")
 
 
 def iso_timestamp_now() -> str:
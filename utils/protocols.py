@@ -8,7 +8,7 @@ class HealthCheckSynapse(BaseModel):
 class HealthCheckResponse(BaseModel):
     class_name: str = 'HealthCheckResponse'
     time_completed: int
-    pool_addresses: list[str]
+    pool_addresses: tuple[str, ...]
     
 class PoolEventSynapse(BaseModel):
     class_name: str = 'PoolEventSynapse'